@@ -6,11 +6,32 @@ NOTE: AI analysis is handled by the central consensus-engine, not here.
 """
 
 import argparse
+import hashlib
 import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
+from itertools import islice
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Characters of text kept per evidence file; extractors stop once it is filled
+TEXT_BUDGET = 5000
+
+# Bump whenever an extractor's output changes so cached text is not reused
+EXTRACTOR_VERSION = 2
+
+# Extracted text is cached here, keyed by extractor version, budget, path, mtime and size.
+# Opt-in: evidence is client data, so nothing is cached unless IRONCLAD_CACHE_DIR is set.
+CACHE_ROOT = os.environ.get("IRONCLAD_CACHE_DIR")
+CACHE_DIR = Path(CACHE_ROOT) / "evidence" if CACHE_ROOT else None
+
 
 def load_framework(framework_path: Path) -> dict:
     """Load the compliance framework JSON."""
@@ -21,56 +42,170 @@ def load_framework(framework_path: Path) -> dict:
 def load_evidence_files(evidence_dir: Path) -> list:
     """Load and catalog all evidence files."""
     evidence_files = []
-    for file_path in evidence_dir.iterdir():
-        if file_path.is_file():
-            evidence_files.append({
-                "name": file_path.name,
-                "path": str(file_path),
-                "type": file_path.suffix.lower().lstrip("."),
-                "size": file_path.stat().st_size
-            })
+    # DirEntry caches file type and stat info from the directory scan
+    with os.scandir(evidence_dir) as entries:
+        for entry in entries:
+            if entry.is_file():
+                evidence_files.append({
+                    "name": entry.name,
+                    "path": entry.path,
+                    "type": Path(entry.name).suffix.lower().lstrip("."),
+                    "size": entry.stat().st_size
+                })
     return evidence_files
 
 
+def extract_pdf_text(file_path: Path) -> str:
+    """
+    Extract text from the first pages of a PDF using PDFium.
+    Pages are joined with newlines; PDFium does not end page text with one.
+    Falls back to PyPDF2 if PDFium cannot handle the document.
+    """
+    import pypdfium2 as pdfium
+    
+    try:
+        pdf = pdfium.PdfDocument(file_path)
+    except pdfium.PdfiumError:
+        return extract_pdf_text_pypdf2(file_path)
+    
+    try:
+        parts = []
+        length = 0
+        for i in range(min(5, len(pdf))):
+            page = pdf[i]
+            textpage = page.get_textpage()
+            try:
+                parts.append(textpage.get_text_range())
+            finally:
+                # Release PDFium handles eagerly rather than relying on GC
+                textpage.close()
+                page.close()
+            length += len(parts[-1]) + 1
+            if length >= TEXT_BUDGET:
+                break
+        return "\n".join(parts)[:TEXT_BUDGET]
+    except pdfium.PdfiumError:
+        return extract_pdf_text_pypdf2(file_path)
+    finally:
+        pdf.close()
+
+
+def extract_pdf_text_pypdf2(file_path: Path) -> str:
+    """Extract text from the first pages of a PDF using PyPDF2."""
+    import PyPDF2
+    with open(file_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        parts = []
+        length = 0
+        for page in reader.pages[:5]:
+            parts.append(page.extract_text() or "")
+            length += len(parts[-1]) + 1
+            if length >= TEXT_BUDGET:
+                break
+        return "\n".join(parts)[:TEXT_BUDGET]
+
+
+def extract_xlsx_text(file_path: Path) -> str:
+    """Extract text from the first rows of the first sheets using calamine."""
+    from python_calamine import CalamineWorkbook
+    
+    wb = CalamineWorkbook.from_path(str(file_path))
+    parts = []
+    length = 0
+    for sheet_name in wb.sheet_names[:2]:
+        rows = wb.get_sheet_by_name(sheet_name).iter_rows()
+        for row in islice(rows, 50):
+            parts.append(" ".join([str(c) for c in row if c]))
+            length += len(parts[-1]) + 1
+            if length >= TEXT_BUDGET:
+                return "\n".join(parts)[:TEXT_BUDGET]
+    return "\n".join(parts)[:TEXT_BUDGET]
+
+
+def extract_docx_text(file_path: Path) -> str:
+    """Extract paragraph text from a Word document."""
+    from docx import Document
+    
+    doc = Document(file_path)
+    parts = []
+    length = 0
+    for p in doc.paragraphs:
+        parts.append(p.text)
+        length += len(p.text) + 1
+        if length >= TEXT_BUDGET:
+            break
+    return "\n".join(parts)[:TEXT_BUDGET]
+
+
+def evidence_cache_path(file_path: Path) -> Path:
+    """Cache file for an evidence file's extracted text."""
+    stat = file_path.stat()
+    key = f"{EXTRACTOR_VERSION}:{TEXT_BUDGET}:{file_path.resolve()}:{stat.st_mtime_ns}:{stat.st_size}"
+    return CACHE_DIR / f"{hashlib.blake2b(key.encode()).hexdigest()}.txt"
+
+
+def read_cached_text(cache_path: Path) -> Optional[str]:
+    """Load cached text; a missing or unreadable entry only costs a re-extraction."""
+    try:
+        return cache_path.read_text(encoding="utf-8")
+    except (OSError, UnicodeError):
+        return None
+
+
+def write_cached_text(cache_path: Path, text: str):
+    """Store extracted text in the cache; failures only cost a re-extraction."""
+    try:
+        cache_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, cache_path)
+    except (OSError, UnicodeError):
+        pass
+
+
 def extract_text_from_file(file_path: Path) -> Optional[str]:
-    """Extract text content from various file types."""
+    """
+    Extract text content from various file types.
+    When caching is enabled, successful extractions are cached; placeholders
+    for failed ones are not.
+    """
     suffix = file_path.suffix.lower()
     
     try:
+        cache_path = evidence_cache_path(file_path) if CACHE_DIR else None
+        if cache_path:
+            cached = read_cached_text(cache_path)
+            if cached is not None:
+                return cached
+        
         if suffix in [".txt", ".md", ".csv", ".json"]:
-            return file_path.read_text(errors="ignore")[:5000]
+            with open(file_path, errors="ignore") as f:
+                text = f.read(TEXT_BUDGET)
         
         elif suffix == ".pdf":
             try:
-                import PyPDF2
-                with open(file_path, "rb") as f:
-                    reader = PyPDF2.PdfReader(f)
-                    text = ""
-                    for page in reader.pages[:5]:
-                        text += page.extract_text() or ""
-                    return text[:5000]
+                text = extract_pdf_text(file_path)
             except Exception:
                 return f"[PDF: {file_path.name}]"
         
         elif suffix == ".docx":
             try:
-                from docx import Document
-                doc = Document(file_path)
-                return "\n".join([p.text for p in doc.paragraphs])[:5000]
+                text = extract_docx_text(file_path)
             except Exception:
                 return f"[DOCX: {file_path.name}]"
         
         elif suffix in [".xlsx", ".xls"]:
             try:
-                import openpyxl
-                wb = openpyxl.load_workbook(file_path, read_only=True)
-                text = ""
-                for sheet in wb.worksheets[:2]:
-                    for row in sheet.iter_rows(max_row=50, values_only=True):
-                        text += " ".join([str(c) for c in row if c]) + "\n"
-                return text[:5000]
+                text = extract_xlsx_text(file_path)
             except Exception:
                 return f"[XLSX: {file_path.name}]"
+        
+        else:
+            return None
+        
+        if cache_path:
+            write_cached_text(cache_path, text)
+        return text
                 
     except Exception as e:
         print(f"  Warning: Could not extract from {file_path.name}: {e}")
@@ -78,30 +213,87 @@ def extract_text_from_file(file_path: Path) -> Optional[str]:
     return None
 
 
-def match_evidence_to_control(control: dict, evidence_texts: dict) -> dict:
+def extract_evidence_texts(evidence_files: list) -> dict:
     """
-    Simple keyword matching to determine if evidence might satisfy a control.
-    Returns a finding dict for AI analysis.
+    Extract text from all evidence files in parallel.
+    Extraction is CPU-bound, so files are spread across a process pool.
+    """
+    evidence_texts = {}
+    if not evidence_files:
+        return evidence_texts
+    
+    names = [ef["name"] for ef in evidence_files]
+    paths = [Path(ef["path"]) for ef in evidence_files]
+    max_workers = min(os.cpu_count() or 1, len(paths))
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as ex:
+        # One file per task: each is a whole-document parse, so IPC cost is
+        # negligible and every worker gets work even for small evidence sets.
+        # map() yields lazily in submission order, keeping output deterministic
+        for name, text in zip(names, ex.map(extract_text_from_file, paths)):
+            if text:
+                evidence_texts[name] = text
+    return evidence_texts
+
+
+def tokenize(text: str) -> set:
+    """
+    Lowercase and split text into word tokens.
+    A trailing "s" is dropped from longer tokens so "incidents" matches "incident".
+    """
+    return {
+        t[:-1] if len(t) > 3 and t.endswith("s") else t
+        for t in TOKEN_PATTERN.findall(text.lower())
+    }
+
+
+def tokenize_evidence(evidence_texts: dict) -> dict:
+    """Tokenize each evidence text once, up front."""
+    return {name: tokenize(text) for name, text in evidence_texts.items()}
+
+
+def control_keywords(control: dict) -> set:
+    """
+    Keywords drawn from a control's common evidence types.
+    Tokenized the same way as evidence, so "IDS/IPS" yields "ids" and "ips".
+    """
+    keywords = set()
+    for ev in control.get("common_evidence", []):
+        keywords.update(tokenize(ev))
+    return keywords
+
+
+def score_controls(controls: list, evidence_tokens: dict) -> np.ndarray:
+    """
+    Count distinct keyword hits for every control against every evidence file.
+    Returns a (controls x files) matrix, computed as one matrix product of
+    control/keyword and file/keyword incidence matrices.
     """
-    control_keywords = []
+    control_kws = [control_keywords(control) for control in controls]
+    vocab = {kw: j for j, kw in enumerate(set().union(*control_kws))}
     
-    # Extract keywords from control description
-    description = control.get("description", "").lower()
-    name = control.get("name", "").lower()
+    C = np.zeros((len(controls), len(vocab)), dtype=np.float32)
+    for i, kws in enumerate(control_kws):
+        C[i, [vocab[kw] for kw in kws]] = 1
     
-    # Common evidence types as keywords
+    E = np.zeros((len(evidence_tokens), len(vocab)), dtype=np.float32)
+    for j, tokens in enumerate(evidence_tokens.values()):
+        E[j, [vocab[kw] for kw in tokens.intersection(vocab)]] = 1
+    
+    # float32 keeps the product on BLAS; counts are small integers, so exact
+    return (C @ E.T).astype(np.int32)
+
+
+def match_evidence_to_control(control: dict, evidence_names: list, scores: np.ndarray) -> dict:
+    """
+    Simple keyword matching to determine if evidence might satisfy a control.
+    `scores` is this control's row of score_controls(), one count per file.
+    Returns a finding dict for AI analysis.
+    """
     common_evidence = control.get("common_evidence", [])
-    for ev in common_evidence:
-        control_keywords.extend(ev.lower().split())
     
     # Check which evidence files might be relevant
-    matched_evidence = []
-    for filename, text in evidence_texts.items():
-        text_lower = text.lower()
-        # Simple keyword matching
-        matches = sum(1 for kw in control_keywords if kw in text_lower)
-        if matches > 2:
-            matched_evidence.append(filename)
+    matched_evidence = [evidence_names[j] for j in np.flatnonzero(scores > 2)]
     
     # Determine preliminary status based on evidence availability
     if len(matched_evidence) >= 2:
@@ -130,6 +322,7 @@ def main():
     parser.add_argument("--evidence-dir", required=True)
     parser.add_argument("--assessment-type", default="full")
     parser.add_argument("--output", required=True)
+    parser.add_argument("--pretty", action="store_true", help="Indent the JSON output")
     args = parser.parse_args()
     
     framework_path = Path(args.framework)
@@ -148,18 +341,17 @@ def main():
     print(f"   Found {len(evidence_files)} evidence files")
     
     # Extract text from evidence
-    evidence_texts = {}
-    for ef in evidence_files:
-        text = extract_text_from_file(Path(ef["path"]))
-        if text:
-            evidence_texts[ef["name"]] = text
+    evidence_texts = extract_evidence_texts(evidence_files)
     
     print(f"   Extracted text from {len(evidence_texts)} files")
+    evidence_tokens = tokenize_evidence(evidence_texts)
+    scores = score_controls(controls, evidence_tokens)
+    evidence_names = list(evidence_tokens)
     
     # Map evidence to controls
     findings = []
-    for control in controls:
-        finding = match_evidence_to_control(control, evidence_texts)
+    for control, control_scores in zip(controls, scores):
+        finding = match_evidence_to_control(control, evidence_names, control_scores)
         findings.append(finding)
     
     # Calculate preliminary stats
@@ -168,8 +360,9 @@ def main():
     potential_gap = sum(1 for f in findings if f["preliminary_status"] == "potential_gap")
     
     # Build output
+    now = datetime.now(timezone.utc)
     result = {
-        "assessment_id": f"{args.client_id}-{framework['framework']['id']}-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+        "assessment_id": f"{args.client_id}-{framework['framework']['id']}-{now.astimezone().strftime('%Y%m%d%H%M%S')}",
         "client_id": args.client_id,
         "framework": {
             "id": framework["framework"]["id"],
@@ -177,7 +370,7 @@ def main():
             "version": framework["framework"]["version"]
         },
         "assessment_type": args.assessment_type,
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": now.isoformat(),
         "evidence_files": evidence_files,
         "preliminary_summary": {
             "total_controls": len(controls),
@@ -190,7 +383,10 @@ def main():
     }
     
     with open(output_path, "w") as f:
-        json.dump(result, f, indent=2)
+        if args.pretty:
+            json.dump(result, f, indent=2)
+        else:
+            json.dump(result, f, separators=(",", ":"))
     
     print(f"\n✅ Preliminary assessment complete")
     print(f"   Potential Compliant: {potential_compliant}")
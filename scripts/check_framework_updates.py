@@ -6,11 +6,15 @@ Checks official sources for updates to compliance frameworks.
 
 import argparse
 import json
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from itertools import repeat
 from pathlib import Path
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 FRAMEWORK_SOURCES = {
@@ -40,9 +44,35 @@ FRAMEWORK_SOURCES = {
     }
 }
 
+# Phrases on a framework page that suggest a new release
+UPDATE_PATTERN = re.compile(r"new version|updated|revision|latest", re.IGNORECASE)
 
-def check_for_updates(framework_id: str, config: dict) -> dict:
-    """Check a framework's official page for update indicators."""
+# Shared across checks so keep-alive connections and TLS sessions are reused
+SESSION = requests.Session()
+SESSION.headers["User-Agent"] = "IronClad-Compliance-Checker/1.0"
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=10,
+    max_retries=Retry(total=2, backoff_factor=0.5)
+))
+
+
+def load_validators(validators_path: Path) -> dict:
+    """Load ETag/Last-Modified values saved by the previous run."""
+    try:
+        with open(validators_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def check_for_updates(framework_id: str, config: dict, validators: dict) -> dict:
+    """
+    Check a framework's official page for update indicators.
+    Sends the page's saved validators so an unchanged page costs a 304.
+    Fresh validators are written back into `validators` only when no update
+    was detected, so a flagged page is fetched and flagged again next run.
+    """
     result = {
         "framework_id": framework_id,
         "name": config["name"],
@@ -53,20 +83,29 @@ def check_for_updates(framework_id: str, config: dict) -> dict:
     }
     
     try:
-        headers = {"User-Agent": "IronClad-Compliance-Checker/1.0"}
-        response = requests.get(config["check_url"], headers=headers, timeout=30)
-        response.raise_for_status()
+        headers = {}
+        saved = validators.get(framework_id, {})
+        if saved.get("etag"):
+            headers["If-None-Match"] = saved["etag"]
+        if saved.get("last_modified"):
+            headers["If-Modified-Since"] = saved["last_modified"]
         
-        soup = BeautifulSoup(response.text, "html.parser")
-        page_text = soup.get_text().lower()
+        response = SESSION.get(config["check_url"], headers=headers, timeout=30)
+        if response.status_code == 304:
+            result["details"] = "Not modified since last check"
+            return result
+        response.raise_for_status()
         
         # Look for update indicators
-        update_phrases = ["new version", "updated", "revision", "latest"]
-        for phrase in update_phrases:
-            if phrase in page_text:
-                result["details"] = f"Found '{phrase}' - manual review recommended"
-                result["update_detected"] = True
-                break
+        match = UPDATE_PATTERN.search(response.text)
+        if match:
+            result["details"] = f"Found '{match.group(0).lower()}' - manual review recommended"
+            result["update_detected"] = True
+        else:
+            validators[framework_id] = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified")
+            }
                 
     except Exception as e:
         result["error"] = str(e)
@@ -78,9 +117,13 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--framework", default="")
     parser.add_argument("--output", default="updates.json")
+    parser.add_argument("--pretty", action="store_true", help="Indent the JSON output")
+    parser.add_argument("--validators", help="ETag/Last-Modified store (default: etags.json next to --output)")
     args = parser.parse_args()
     
     frameworks = {args.framework: FRAMEWORK_SOURCES[args.framework]} if args.framework else FRAMEWORK_SOURCES
+    validators_path = Path(args.validators) if args.validators else Path(args.output).with_name("etags.json")
+    validators = load_validators(validators_path)
     
     results = {
         "checked_at": datetime.now(timezone.utc).isoformat(),
@@ -89,9 +132,14 @@ def main():
         "checks": []
     }
     
-    for fid, config in frameworks.items():
+    for config in frameworks.values():
         print(f"Checking {config['name']}...")
-        check = check_for_updates(fid, config)
+    
+    # Checks are network-bound, so run them all concurrently
+    with ThreadPoolExecutor(max_workers=len(frameworks)) as ex:
+        checks = list(ex.map(check_for_updates, frameworks.keys(), frameworks.values(), repeat(validators)))
+    
+    for fid, check in zip(frameworks, checks):
         results["checks"].append(check)
         
         if check.get("update_detected"):
@@ -99,7 +147,13 @@ def main():
             results["frameworks"].append(fid)
     
     with open(args.output, "w") as f:
-        json.dump(results, f, indent=2)
+        if args.pretty:
+            json.dump(results, f, indent=2)
+        else:
+            json.dump(results, f, separators=(",", ":"))
+    
+    with open(validators_path, "w") as f:
+        json.dump(validators, f, indent=2)
     
     print(f"Results: {args.output}")
 
@@ -9,6 +9,11 @@ from pathlib import Path
 
 from google.cloud import firestore
 from google.cloud import storage
+from google.cloud.storage import transfer_manager
+
+
+# Reports larger than this are uploaded in parallel chunks
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
 
 
 def main():
@@ -28,6 +33,8 @@ def main():
         print("❌ Missing FIREBASE_PROJECT_ID or GCS_BUCKET")
         return
     
+    now = datetime.now(timezone.utc)
+    
     # Upload PDF to GCS
     storage_client = storage.Client()
     bucket = storage_client.bucket(bucket_name)
@@ -36,29 +43,38 @@ def main():
     report_dir = Path(args.report_dir)
     for pdf in report_dir.glob("*.pdf"):
         blob = bucket.blob(f"reports/{args.client_id}/{args.assessment_id}.pdf")
-        blob.upload_from_filename(str(pdf))
+        if pdf.stat().st_size > UPLOAD_CHUNK_SIZE:
+            transfer_manager.upload_chunks_concurrently(
+                str(pdf), blob,
+                content_type="application/pdf",
+                chunk_size=UPLOAD_CHUNK_SIZE,
+                worker_type=transfer_manager.THREAD,
+                max_workers=4
+            )
+        else:
+            # Single-request multipart upload; no resumable session setup
+            blob.upload_from_filename(str(pdf), content_type="application/pdf")
         report_url = f"gs://{bucket_name}/reports/{args.client_id}/{args.assessment_id}.pdf"
         print(f"📤 Uploaded: {report_url}")
     
     # Load results
-    results_dir = Path(args.results_dir)
-    results = {}
-    for f in results_dir.glob("*.json"):
-        with open(f) as fp:
-            results = json.load(fp)
-        break
+    results_file = next(Path(args.results_dir).glob("*.json"), None)
+    results = json.loads(results_file.read_bytes()) if results_file else {}
     
     # Store in Firestore
     db = firestore.Client(project=project_id)
     
     assessment_ref = db.collection("clients").document(args.client_id)\
         .collection("assessments").document(args.assessment_id)
+    client_ref = db.collection("clients").document(args.client_id)
     
-    assessment_ref.set({
+    # Write the assessment and the client's latest pointer in one commit
+    batch = db.batch()
+    batch.set(assessment_ref, {
         "assessment_id": args.assessment_id,
         "client_id": args.client_id,
         "framework": results.get("framework", {}),
-        "timestamp": datetime.now(timezone.utc),
+        "timestamp": now,
         "preliminary_summary": results.get("preliminary_summary", {}),
         "ai_consensus": {
             "severity": args.consensus_severity,
@@ -67,17 +83,14 @@ def main():
         "report_url": report_url,
         "status": "complete"
     })
-    
-    print(f"✅ Stored assessment: {args.assessment_id}")
-    
-    # Update client's latest
-    client_ref = db.collection("clients").document(args.client_id)
-    client_ref.set({
+    batch.set(client_ref, {
         "latest_assessment": args.assessment_id,
-        "latest_assessment_date": datetime.now(timezone.utc),
+        "latest_assessment_date": now,
         "latest_consensus": args.consensus_severity
     }, merge=True)
+    batch.commit()
     
+    print(f"✅ Stored assessment: {args.assessment_id}")
     print(f"✅ Updated client record: {args.client_id}")
 
 